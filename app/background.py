@@ -0,0 +1,44 @@
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# поток, который вызывает func раз в interval секунд (или раньше, по wake), пока его не остановят
+class PeriodicWorker:
+    def __init__(self, name: str, interval: float, func):
+        self.name = name
+        self.interval = interval
+        self.func = func
+        self.stop_event = threading.Event()
+        self.wake_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        if self.thread is not None:
+            return
+        self.stop_event.clear()
+        self.wake_event.clear()
+        self.thread = threading.Thread(target=self.run, name=self.name, daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout: float = None):
+        if self.thread is None:
+            return
+        self.stop_event.set()
+        self.wake_event.set()
+        self.thread.join(timeout)
+        self.thread = None
+
+    def wake(self):
+        self.wake_event.set()
+
+    def run(self):
+        while True:
+            self.wake_event.wait(self.interval)
+            self.wake_event.clear()
+            if self.stop_event.is_set():
+                break
+            try:
+                self.func()
+            except Exception:
+                logger.exception("%s failed", self.name)
@@ -0,0 +1,5 @@
+from sqlalchemy.orm import declarative_base
+
+# отдельно от database.py, чтобы модели можно было импортировать без configs/db.json
+# (утилиты из app/tools работают с базой по --url)
+Base = declarative_base()
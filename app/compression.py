@@ -0,0 +1,171 @@
+import gzip
+import hashlib
+import time
+from collections import OrderedDict
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+
+from .settings import settings
+
+try:
+    import brotli
+except ImportError:  # br просто не будет предлагаться
+    brotli = None
+
+# большие ответы сжимаем в threadpool, чтобы не блокировать event loop
+THREADPOOL_THRESHOLD = 256 * 1024
+
+stats = {
+    "compressed": 0,
+    "skipped": 0,
+    "cache_hits": 0,
+    "bytes_in": 0,
+    "bytes_out": 0,
+    "compress_seconds": 0.0,
+}
+
+def choose_encoding(accept_encoding: str) -> str:
+    accepted = set()
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        if params.strip().replace(" ", "") in ("q=0", "q=0.0"):
+            continue
+        accepted.add(name.strip().lower())
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+class CompressedCache:
+    # ключ - хеш тела ответа: одинаковые ответы сжимаются один раз
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.entries = OrderedDict()
+
+    def get(self, key):
+        value = self.entries.get(key)
+        if value is not None:
+            self.entries.move_to_end(key)
+        return value
+
+    def put(self, key, value: bytes):
+        if len(value) > self.max_bytes or key in self.entries:
+            return
+        self.entries[key] = value
+        self.size += len(value)
+        while len(self.entries) > self.max_entries or self.size > self.max_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.size -= len(evicted)
+
+class CompressionMiddleware:
+    def __init__(self, app, config: dict = None):
+        self.app = app
+        self.config = config or settings["compression"]
+        self.cache = CompressedCache(self.config["cache_entries"], self.config["cache_bytes"])
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.config["enabled"]:
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, passthrough
+            if message["type"] == "http.response.start":
+                if self.is_excluded(message):
+                    passthrough = True
+                    stats["skipped"] += 1
+                    await send(message)
+                else:
+                    start_message = message
+                return
+            if passthrough or message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            # потоковые ответы (экспорт, SSE) не буферизуем
+            if message.get("more_body", False) or len(body) < self.config["min_size"]:
+                passthrough = True
+                stats["skipped"] += 1
+                await send(start_message)
+                await send(message)
+                return
+
+            compressed = await self.compress(body, encoding, self.is_cacheable(scope, start_message))
+            headers = MutableHeaders(raw=start_message["headers"])
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(compressed))
+            headers.add_vary_header("Accept-Encoding")
+            if "etag" in headers:
+                # сжатое представление отличается от исходного побайтно
+                headers["ETag"] = "W/" + headers["etag"].removeprefix("W/")
+            await send(start_message)
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_wrapper)
+
+    def is_excluded(self, message) -> bool:
+        if message["status"] < 200 or message["status"] in (204, 304):
+            return True
+        headers = Headers(raw=message["headers"])
+        if "content-encoding" in headers:
+            return True
+        content_type = headers.get("content-type", "")
+        return any(content_type.startswith(prefix) for prefix in self.config["excluded_types"])
+
+    def is_cacheable(self, scope, start_message) -> bool:
+        if scope["method"] != "GET" or start_message["status"] != 200:
+            return False
+        headers = Headers(raw=start_message["headers"])
+        cache_control = headers.get("cache-control", "")
+        return "set-cookie" not in headers and "no-store" not in cache_control and "private" not in cache_control
+
+    async def compress(self, body: bytes, encoding: str, cacheable: bool) -> bytes:
+        key = None
+        if cacheable:
+            key = (encoding, hashlib.blake2b(body, digest_size=16).digest())
+            cached = self.cache.get(key)
+            if cached is not None:
+                stats["cache_hits"] += 1
+                self.count(body, cached, 0.0)
+                return cached
+
+        if len(body) >= THREADPOOL_THRESHOLD:
+            compressed, seconds = await run_in_threadpool(self.compress_body, body, encoding)
+        else:
+            compressed, seconds = self.compress_body(body, encoding)
+        self.count(body, compressed, seconds)
+
+        if key is not None:
+            self.cache.put(key, compressed)
+        return compressed
+
+    # возвращает сжатое тело и процессорное время сжатия. время меряется в потоке, который сжимает,
+    # иначе в него попадало бы ожидание свободного потока в пуле
+    def compress_body(self, body: bytes, encoding: str) -> tuple:
+        started = time.thread_time()
+        if encoding == "br":
+            compressed = brotli.compress(body, quality=self.config["brotli_quality"])
+        else:
+            compressed = gzip.compress(body, compresslevel=self.config["gzip_level"], mtime=0)
+        return compressed, time.thread_time() - started
+
+    def count(self, body: bytes, compressed: bytes, seconds: float):
+        stats["compressed"] += 1
+        stats["bytes_in"] += len(body)
+        stats["bytes_out"] += len(compressed)
+        stats["compress_seconds"] += seconds
+
+def get_metrics() -> dict:
+    ratio = stats["bytes_in"] / stats["bytes_out"] if stats["bytes_out"] else None
+    return {**stats, "ratio": ratio}
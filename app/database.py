@@ -1,23 +1,52 @@
 import json
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import sessionmaker
 
-with open(f'./configs/db.json', encoding="utf-8") as file:
-    config = json.load(file)
+from .base import Base  # noqa: F401
 
-if (config['db_type'] == 'sqlite'):
-    SQLALCHEMY_DATABASE_URL = "sqlite:///./database.db"
-else:
-    SQLALCHEMY_DATABASE_URL = f"{config['db_type']}://" + \
+# engine создается при первом обращении к database.engine, а не при импорте:
+# утилиты из app/tools импортируют роутеры, но работают со своей базой и без configs/db.json
+SessionLocal = sessionmaker(autocommit=False, autoflush=False)
+
+_engine = None
+
+def get_database_url(path: str = "./configs/db.json") -> str:
+    with open(path, encoding="utf-8") as file:
+        config = json.load(file)
+
+    if (config['db_type'] == 'sqlite'):
+        return "sqlite:///./database.db"
+    return f"{config['db_type']}://" + \
         f"{config['user']}:" + \
         f"{config['password']}@" + \
         f"{config['host']}:{config['port']}/" + \
         f"{config['db_name']}"
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL,
-    connect_args={"check_same_thread": False} if "sqlite" in SQLALCHEMY_DATABASE_URL else {}
-)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+def get_engine() -> Engine:
+    global _engine
+    if _engine is not None:
+        return _engine
+
+    url = get_database_url()
+    engine = create_engine(
+        url,
+        connect_args={"check_same_thread": False} if "sqlite" in url else {}
+    )
+
+    if engine.dialect.name == "sqlite":
+        # без этого sqlite не выполняет ON DELETE CASCADE
+        @event.listens_for(engine, "connect")
+        def enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            cursor.execute("PRAGMA foreign_keys=ON")
+            cursor.close()
+
+    SessionLocal.configure(bind=engine)
+    _engine = engine
+    return engine
 
-Base = declarative_base()
+def __getattr__(name: str):
+    if name == "engine":
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
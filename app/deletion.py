@@ -0,0 +1,100 @@
+import logging
+import threading
+from fastapi import BackgroundTasks
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+
+from .database import SessionLocal
+from .settings import settings
+from . import models, storage
+
+logger = logging.getLogger(__name__)
+
+# лайки и комментарии удаляются самой БД (ON DELETE CASCADE), в память ничего не грузим
+
+def get_user_files(db: Session, user: models.User) -> set:
+    previews = db.execute(
+        select(models.Post.preview).where(
+            models.Post.user_id == user.id,
+            models.Post.preview.is_not(None)
+        )
+    ).scalars().all()
+    return {user.avatar, *previews}
+
+def delete_post(db: Session, post: models.Post):
+    preview = post.preview
+    db.delete(post)
+    db.commit()
+    storage.release_file(db, preview)
+
+# возвращает True, если удаление ушло в фон
+def delete_user(db: Session, user: models.User, background_tasks: BackgroundTasks) -> bool:
+    posts_count = db.query(models.Post).filter(models.Post.user_id == user.id).count()
+    if posts_count <= settings["deletion"]["background_threshold"]:
+        files = get_user_files(db, user)
+        db.delete(user)
+        db.commit()
+        for filename in files:
+            storage.release_file(db, filename)
+        return False
+
+    # до окончания фонового удаления пользователь не должен иметь возможности войти
+    db.query(models.UserSession).filter(models.UserSession.user_id == user.id).delete()
+    user.password = ""
+    db.add(models.UserDeletion(user_id=user.id))
+    db.commit()
+    background_tasks.add_task(delete_user_in_batches, user.id)
+    return True
+
+def delete_user_in_batches(user_id: int, batch_size: int = None):
+    batch_size = batch_size or settings["deletion"]["batch_size"]
+    db = SessionLocal()
+    try:
+        while True:
+            rows = db.execute(
+                select(models.Post.id, models.Post.preview)
+                .where(models.Post.user_id == user_id)
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                break
+            db.execute(delete(models.Post).where(models.Post.id.in_([row.id for row in rows])))
+            db.commit()
+            for preview in {row.preview for row in rows}:
+                storage.release_file(db, preview)
+
+        # комментарии и лайки пользователя под чужими постами тоже пачками
+        for model in (models.Comment, models.PostLike):
+            while True:
+                ids = db.execute(
+                    select(model.id).where(model.user_id == user_id).limit(batch_size)
+                ).scalars().all()
+                if not ids:
+                    break
+                db.execute(delete(model).where(model.id.in_(ids)))
+                db.commit()
+
+        user = db.query(models.User).filter(models.User.id == user_id).first()
+        if user:
+            avatar = user.avatar
+            db.delete(user)
+            db.commit()
+            storage.release_file(db, avatar)
+    finally:
+        db.close()
+
+# удаления, прерванные перезапуском процесса, продолжаются при старте приложения
+def resume_deletions():
+    db = SessionLocal()
+    try:
+        user_ids = db.execute(select(models.UserDeletion.user_id)).scalars().all()
+    finally:
+        db.close()
+    for user_id in user_ids:
+        try:
+            delete_user_in_batches(user_id)
+        except Exception:
+            logger.exception("failed to resume deletion of user %s", user_id)
+
+def resume_in_background():
+    threading.Thread(target=resume_deletions, name="user-deletion-resume", daemon=True).start()
@@ -2,7 +2,7 @@ from fastapi import HTTPException, Header, Depends, Request
 from sqlalchemy.orm import Session
 from datetime import datetime
 from .database import SessionLocal
-from . import models
+from . import limiter, models
 
 def get_db():
     db = SessionLocal()
@@ -24,4 +24,5 @@ def get_current_user_id(request: Request, db: Session = Depends(get_db)) -> int:
     if not session_obj:
         raise HTTPException(status_code=401, detail="Invalid or expired session")
 
+    limiter.remember_session(token, session_obj.expires)
     return session_obj.user_id
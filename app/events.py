@@ -0,0 +1,74 @@
+import asyncio
+import json
+import threading
+
+from .settings import settings
+
+# простой pub/sub внутри процесса для SSE. публиковать можно из любых потоков (синхронные роуты
+# работают в threadpool), доставка идет в event loop подписчика
+
+class Subscriber:
+    def __init__(self, hub, topic, queue_size: int):
+        self.hub = hub
+        self.topic = topic
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(queue_size)
+        self.evicted = False
+
+    # вызывается в event loop подписчика
+    def offer(self, payload: str):
+        if self.evicted:
+            return
+        try:
+            self.queue.put_nowait(payload)
+        except asyncio.QueueFull:
+            # медленный клиент: отключаем его, а не копим события в памяти
+            self.evicted = True
+            self.hub.unsubscribe(self)
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(None)
+
+class EventHub:
+    def __init__(self, queue_size: int):
+        self.queue_size = queue_size
+        self.topics = {}
+        self.lock = threading.Lock()
+        self.stats = {"published": 0, "evicted": 0}
+
+    def subscribe(self, topic) -> Subscriber:
+        subscriber = Subscriber(self, topic, self.queue_size)
+        with self.lock:
+            self.topics.setdefault(topic, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        with self.lock:
+            subscribers = self.topics.get(subscriber.topic)
+            if subscribers is None or subscriber not in subscribers:
+                return
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del self.topics[subscriber.topic]
+            if subscriber.evicted:
+                self.stats["evicted"] += 1
+
+    def has_subscribers(self, topic) -> bool:
+        return topic in self.topics
+
+    def publish(self, topic, event: str, data: dict):
+        with self.lock:
+            subscribers = list(self.topics.get(topic, ()))
+        if not subscribers:
+            return
+        # сериализуем один раз на всех подписчиков
+        payload = f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+        self.stats["published"] += 1
+        for subscriber in subscribers:
+            try:
+                subscriber.loop.call_soon_threadsafe(subscriber.offer, payload)
+            except RuntimeError:
+                # event loop подписчика уже закрыт
+                self.unsubscribe(subscriber)
+
+hub = EventHub(settings["events"]["queue_size"])
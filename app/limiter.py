@@ -0,0 +1,140 @@
+import asyncio
+import math
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from starlette.requests import cookie_parser
+from starlette.responses import JSONResponse
+
+from .settings import settings
+
+# классы роутов, для которых нужны отдельные лимиты. всё остальное - "write" или "read" по методу
+ROUTE_CLASSES = {
+    ("POST", "/auth/login"): "auth",
+    ("POST", "/auth/register"): "auth",
+    ("POST", "/auth/send_code"): "auth",
+    ("POST", "/auth/confirm_email"): "auth",
+    ("POST", "/recipe/"): "upload",
+    ("POST", "/user/avatar"): "upload",
+    ("PUT", "/user/me/edit"): "upload",
+    ("GET", "/comment/stream"): "stream",
+}
+
+# эти классы всегда считаются по адресу: логин и загрузки не должны обходиться сменой cookie
+IP_KEYED_CLASSES = ("auth", "upload")
+
+stats = {"rate_limited": 0, "shed": 0}
+
+# токены, которые уже проверил get_current_user_id: token -> expires.
+# непроверенный cookie может быть любым, и каждый новый давал бы клиенту свежую корзину
+validated_sessions = OrderedDict()
+validated_sessions_lock = threading.Lock()
+
+def remember_session(token: str, expires: datetime):
+    with validated_sessions_lock:
+        validated_sessions[token] = expires
+        validated_sessions.move_to_end(token)
+        if len(validated_sessions) > settings["rate_limit"]["max_clients"]:
+            validated_sessions.popitem(last=False)
+
+def forget_session(token: str):
+    with validated_sessions_lock:
+        validated_sessions.pop(token, None)
+
+def get_route_class(method: str, path: str) -> str:
+    route_class = ROUTE_CLASSES.get((method, path))
+    if route_class:
+        return route_class
+    return "read" if method in ("GET", "HEAD", "OPTIONS") else "write"
+
+def get_client_key(scope, route_class: str) -> str:
+    # клиента с проверенной сессией различаем по токену, остальных - по адресу
+    if route_class not in IP_KEYED_CLASSES:
+        for name, value in scope["headers"]:
+            if name == b"cookie":
+                token = cookie_parser(value.decode("latin-1")).get("Authorization")
+                expires = validated_sessions.get(token) if token else None
+                if expires is not None and expires >= datetime.utcnow():
+                    return "t:" + token
+                break
+    client = scope.get("client")
+    return "ip:" + (client[0] if client else "unknown")
+
+class TokenBuckets:
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self.buckets = OrderedDict()  # key -> [tokens, last_refill]
+
+    # возвращает 0, если запрос можно пропустить, иначе сколько секунд подождать
+    def take(self, key: str, rate: float, burst: float) -> float:
+        now = time.monotonic()
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = [burst, now]
+            self.buckets[key] = bucket
+            if len(self.buckets) > self.max_keys:
+                self.buckets.popitem(last=False)
+        else:
+            self.buckets.move_to_end(key)
+            bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            return 0
+        return (1 - bucket[0]) / rate
+
+class AdmissionControlMiddleware:
+    def __init__(self, app, config: dict = None):
+        self.app = app
+        self.config = config or settings["rate_limit"]
+        self.classes = self.config["classes"]
+        self.buckets = TokenBuckets(self.config["max_clients"])
+        self.semaphores = {}
+
+    def get_semaphore(self, route_class: str) -> asyncio.Semaphore:
+        semaphore = self.semaphores.get(route_class)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.classes[route_class]["concurrency"])
+            self.semaphores[route_class] = semaphore
+        return semaphore
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.config["enabled"]:
+            await self.app(scope, receive, send)
+            return
+
+        route_class = get_route_class(scope["method"], scope["path"])
+        limits = self.classes[route_class]
+
+        key = route_class + ":" + get_client_key(scope, route_class)
+        wait = self.buckets.take(key, limits["rate"], limits["burst"])
+        if wait:
+            stats["rate_limited"] += 1
+            await self.reject(429, "Too many requests", wait, scope, receive, send)
+            return
+
+        semaphore = self.get_semaphore(route_class)
+        if semaphore.locked():
+            try:
+                await asyncio.wait_for(semaphore.acquire(), limits["queue_timeout"])
+            except asyncio.TimeoutError:
+                stats["shed"] += 1
+                await self.reject(503, "Server is busy", limits["queue_timeout"], scope, receive, send)
+                return
+        else:
+            await semaphore.acquire()
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            semaphore.release()
+
+    async def reject(self, status_code: int, detail: str, retry_after: float, scope, receive, send):
+        response = JSONResponse(
+            {"detail": detail},
+            status_code=status_code,
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+        )
+        await response(scope, receive, send)
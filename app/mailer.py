@@ -0,0 +1,187 @@
+import logging
+import smtplib
+import time
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from .background import PeriodicWorker
+from .database import SessionLocal
+from .settings import settings
+from . import models
+
+logger = logging.getLogger(__name__)
+
+# коды подтверждения не отправляются внутри запроса: send_code кладет письмо в email_outbox,
+# а фоновый отправитель забирает их пачками и шлет через одно постоянное SMTP соединение
+
+def enqueue(db: Session, user: models.User, reason: str, subject: str, body: str) -> models.EmailOutbox:
+    # новое письмо того же типа заменяет еще не отправленное, а не идет вторым
+    message = db.query(models.EmailOutbox).filter(
+        models.EmailOutbox.user_id == user.id,
+        models.EmailOutbox.reason == reason,
+        models.EmailOutbox.status == "pending"
+    ).first()
+    if message is None:
+        message = models.EmailOutbox(user_id=user.id, reason=reason)
+        db.add(message)
+    message.recipient = user.email
+    message.subject = subject
+    message.body = body
+    message.attempts = 0
+    message.next_attempt_at = datetime.utcnow()
+    message.last_error = None
+    return message
+
+# ошибки, после которых соединение остается рабочим (smtplib сам делает RSET);
+# все остальные считаются проблемой соединения и прерывают отправку пачки
+MESSAGE_ERRORS = (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError)
+
+class SmtpConnection:
+    def __init__(self, config: dict):
+        self.config = config
+        self.smtp = None
+        self.last_used = 0.0
+
+    def connect(self):
+        smtp = smtplib.SMTP(self.config["host"], self.config["port"], timeout=30)
+        if self.config["starttls"]:
+            smtp.starttls()
+        if self.config["username"]:
+            smtp.login(self.config["username"], self.config["password"])
+        self.smtp = smtp
+
+    def close(self):
+        if self.smtp is None:
+            return
+        try:
+            self.smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            pass
+        self.smtp = None
+
+    def close_if_idle(self):
+        if self.smtp is not None and time.monotonic() - self.last_used > self.config["idle_timeout"]:
+            self.close()
+
+    def send(self, message: EmailMessage):
+        if self.smtp is None:
+            self.connect()
+        try:
+            self.smtp.send_message(message)
+        except smtplib.SMTPServerDisconnected:
+            # сервер закрыл простаивавшее соединение, переподключаемся один раз
+            self.connect()
+            self.smtp.send_message(message)
+        self.last_used = time.monotonic()
+
+class OutboxSender:
+    def __init__(self, config: dict):
+        self.config = config
+        self.connection = SmtpConnection(config)
+        self.worker = PeriodicWorker("email-outbox", config["poll_interval"], self.process)
+
+    def start(self):
+        if self.config["enabled"]:
+            self.worker.start()
+
+    def stop(self):
+        self.worker.stop()
+        self.connection.close()
+
+    # будит отправителя сразу после постановки письма в очередь
+    def wake(self):
+        self.worker.wake()
+
+    def get_backoff(self, attempts: int) -> timedelta:
+        seconds = self.config["backoff"] * 2 ** (attempts - 1)
+        return timedelta(seconds=min(seconds, self.config["backoff_max"]))
+
+    def build_message(self, outbox: models.EmailOutbox) -> EmailMessage:
+        message = EmailMessage()
+        message["From"] = self.config["sender"]
+        message["To"] = outbox.recipient
+        message["Subject"] = outbox.subject
+        message.set_content(outbox.body)
+        return message
+
+    # помечает письма как "sending" до отправки, чтобы их не взял другой процесс;
+    # next_attempt_at становится сроком аренды, по его истечении письмо снова можно забрать
+    def claim(self, db: Session) -> list:
+        now = datetime.utcnow()
+        lease = now + timedelta(seconds=self.config["lease"])
+        ids = db.scalars(select(models.EmailOutbox.id).where(
+            models.EmailOutbox.status.in_(("pending", "sending")),
+            models.EmailOutbox.next_attempt_at <= now
+        ).order_by(models.EmailOutbox.next_attempt_at).limit(self.config["batch_size"])).all()
+        claimed = []
+        for id in ids:
+            # повторная проверка условия в UPDATE: строку мог уже забрать другой процесс
+            result = db.execute(update(models.EmailOutbox).where(
+                models.EmailOutbox.id == id,
+                models.EmailOutbox.status.in_(("pending", "sending")),
+                models.EmailOutbox.next_attempt_at <= now
+            ).values(status="sending", next_attempt_at=lease))
+            if result.rowcount:
+                claimed.append(id)
+        db.commit()
+        if not claimed:
+            return []
+        return db.query(models.EmailOutbox).filter(models.EmailOutbox.id.in_(claimed)) \
+                 .order_by(models.EmailOutbox.id).all()
+
+    def process(self) -> int:
+        sent = 0
+        db = SessionLocal()
+        try:
+            while True:
+                batch = self.claim(db)
+                if not batch:
+                    break
+                for i, outbox in enumerate(batch):
+                    if not self.send(outbox):
+                        # SMTP недоступен: остальные письма возвращаем в очередь до следующего запуска
+                        self.release(batch[i + 1:])
+                        db.commit()
+                        return sent
+                    sent += outbox.status == "sent"
+                    db.commit()
+        finally:
+            db.close()
+            self.connection.close_if_idle()
+        return sent
+
+    def release(self, batch: list):
+        for outbox in batch:
+            outbox.status = "pending"
+            outbox.next_attempt_at = datetime.utcnow()
+
+    def retry_later(self, outbox: models.EmailOutbox, error: Exception):
+        outbox.attempts += 1
+        outbox.last_error = str(error)[:256]
+        if outbox.attempts >= self.config["max_attempts"]:
+            outbox.status = "failed"
+            logger.error("email %s to %s failed: %s", outbox.id, outbox.recipient, error)
+        else:
+            outbox.status = "pending"
+            outbox.next_attempt_at = datetime.utcnow() + self.get_backoff(outbox.attempts)
+
+    # возвращает False, если отправлять дальше нет смысла (нет соединения с SMTP)
+    def send(self, outbox: models.EmailOutbox) -> bool:
+        try:
+            self.connection.send(self.build_message(outbox))
+        except MESSAGE_ERRORS as e:
+            # сервер отклонил именно это письмо, соединение остается рабочим
+            self.retry_later(outbox, e)
+            return True
+        except (smtplib.SMTPException, OSError) as e:
+            self.connection.close()
+            self.retry_later(outbox, e)
+            logger.warning("SMTP server unavailable, sending postponed: %s", e)
+            return False
+        outbox.status = "sent"
+        outbox.sent_at = datetime.utcnow()
+        return True
+
+outbox_sender = OutboxSender(settings["email"])
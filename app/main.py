@@ -1,14 +1,55 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from sqlalchemy import delete, func, inspect, select
 from .database import Base, engine
 from .routers import auth, user, recipe, comment, admin, file
+from .compression import CompressionMiddleware
+from .events import hub
+from .limiter import AdmissionControlMiddleware
+from .mailer import outbox_sender
+from .rating_buffer import rating_buffer
+from . import compression, deletion, limiter, models, storage
 from fastapi.middleware.cors import CORSMiddleware
 
+# раньше оценка ставилась через проверку и вставку, и в старых базах бывают повторные
+# оценки одного пользователя за пост. перед созданием уникального индекса оставляем последнюю
+def remove_duplicate_likes():
+    if "ix_post_likes_user_id_post_id" in {i["name"] for i in inspect(engine).get_indexes("post_likes")}:
+        return
+    likes = models.PostLike.__table__
+    # MySQL не дает читать изменяемую таблицу в подзапросе, поэтому id идут через производную таблицу
+    keep = select(func.max(likes.c.id).label("id")).group_by(likes.c.user_id, likes.c.post_id).subquery("keep")
+    with engine.begin() as conn:
+        conn.execute(delete(likes).where(likes.c.id.not_in(select(keep.c.id))))
+
 def create_tables():
     Base.metadata.create_all(bind=engine)
+    remove_duplicate_likes()
+    # create_all не добавляет новые индексы в уже существующие таблицы
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    storage.gc_worker.start()
+    rating_buffer.start()
+    outbox_sender.start()
+    deletion.resume_in_background()
+    yield
+    outbox_sender.stop()
+    # оставшиеся в буфере оценки нужно записать до остановки
+    rating_buffer.stop()
+    storage.gc_worker.stop()
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 app.router.redirect_slashes = False
 
+app.add_middleware(CompressionMiddleware)
+
+# лимиты на клиента и на класс роутов, подключается до CORS, чтобы отказы тоже получали CORS заголовки
+app.add_middleware(AdmissionControlMiddleware)
+
 # TODO подумать над удалением
 app.add_middleware(
     CORSMiddleware,
@@ -30,3 +71,11 @@ app.include_router(admin.router, prefix="/admin", tags=["Admin"])
 @app.get("/")
 def root():
     return {"message": "API is working!"}
+
+@app.get("/metrics")
+def metrics():
+    return {
+        "compression": compression.get_metrics(),
+        "rate_limit": limiter.stats,
+        "events": hub.stats,
+    }
@@ -1,8 +1,8 @@
-from sqlalchemy import Boolean, Column, Integer, String, DateTime, ForeignKey, func, select
+from sqlalchemy import Boolean, Column, Integer, String, DateTime, ForeignKey, Index, func, select
 from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.orm import relationship
 from datetime import datetime
-from .database import Base
+from .base import Base
 
 class User(Base):
     __tablename__ = "users"
@@ -12,10 +12,10 @@ class User(Base):
     password = Column(String(64), nullable=False)
     name = Column(String(16), nullable=True)
     surname = Column(String(16), nullable=True)
-    avatar = Column(String(32), nullable=True)
+    avatar = Column(String(32), nullable=True, index=True)
     is_admin = Column(Boolean, default=False, nullable=False)
 
-    posts = relationship("Post", back_populates="author", cascade="all, delete-orphan")
+    posts = relationship("Post", back_populates="author", cascade="all, delete-orphan", passive_deletes=True)
 
 class Post(Base):
     __tablename__ = "posts"
@@ -24,11 +24,16 @@ class Post(Base):
     title = Column(String(64), nullable=False)
     text = Column(String(8192), nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
-    preview = Column(String(32), nullable=True)
+    preview = Column(String(32), nullable=True, index=True)
 
     author = relationship("User", back_populates="posts")
-    likes = relationship("PostLike", back_populates="post", cascade="all, delete-orphan")
-    comments = relationship("Comment", back_populates="post", cascade="all, delete-orphan")
+    likes = relationship("PostLike", back_populates="post", cascade="all, delete-orphan", passive_deletes=True)
+    comments = relationship("Comment", back_populates="post", cascade="all, delete-orphan", passive_deletes=True)
+
+    __table_args__ = (
+        Index("ix_posts_created_at", "created_at"),  # общая лента
+        Index("ix_posts_user_id_created_at", "user_id", "created_at"),  # лента пользователя
+    )
 
     @hybrid_property
     def rating(self):
@@ -55,6 +60,11 @@ class Comment(Base):
     user = relationship("User")
     post = relationship("Post", back_populates="comments")
 
+    __table_args__ = (
+        Index("ix_comments_post_id_created_at", "post_id", "created_at"),
+        Index("ix_comments_user_id", "user_id"),
+    )
+
 class PostLike(Base):
     __tablename__ = "post_likes"
     id = Column(Integer, primary_key=True, index=True)
@@ -64,6 +74,13 @@ class PostLike(Base):
 
     post = relationship("Post", back_populates="likes")
 
+    __table_args__ = (
+        # одна оценка от пользователя на пост
+        Index("ix_post_likes_user_id_post_id", "user_id", "post_id", unique=True),
+        # покрывающий индекс для подсчета рейтинга
+        Index("ix_post_likes_post_id_value", "post_id", "value"),
+    )
+
 # реализовать в будущем
 class TempCode(Base):
     __tablename__ = "temp_codes"
@@ -73,9 +90,41 @@ class TempCode(Base):
     type = Column(String(24), nullable=False)
     expires = Column(DateTime, nullable=False)
 
+    __table_args__ = (
+        Index("ix_temp_codes_user_id_type", "user_id", "type"),
+    )
+
 class UserSession(Base):
     __tablename__ = "user_sessions"
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
     token = Column(String(64), nullable=False, unique=True)
     expires = Column(DateTime, nullable=False)
+
+# пользователь, которого удаляют в фоне (app/deletion.py). запись переживает перезапуск процесса,
+# при старте незаконченные удаления продолжаются; вместе с пользователем удаляется и она
+class UserDeletion(Base):
+    __tablename__ = "user_deletions"
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+# письма отправляются фоновым отправителем (app/mailer.py), а не внутри запроса
+class EmailOutbox(Base):
+    __tablename__ = "email_outbox"
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    reason = Column(String(24), nullable=False)
+    recipient = Column(String(320), nullable=False)
+    subject = Column(String(128), nullable=False)
+    body = Column(String(2048), nullable=False)
+    status = Column(String(8), default="pending", nullable=False)  # pending, sending, sent, failed
+    attempts = Column(Integer, default=0, nullable=False)
+    next_attempt_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    last_error = Column(String(256), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    sent_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ix_email_outbox_status_next_attempt_at", "status", "next_attempt_at"),
+        Index("ix_email_outbox_user_id_reason", "user_id", "reason"),
+    )
@@ -0,0 +1,136 @@
+import logging
+import threading
+from sqlalchemy import select
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.orm import Session
+from typing import Optional
+
+from .background import PeriodicWorker
+from .database import SessionLocal
+from .events import hub
+from .settings import settings
+from . import models
+
+# режим отложенной записи оценок: rate_post только кладет оценку в память, повторные оценки
+# одного пользователя схлопываются, а в БД все уходит пачками одним upsert'ом
+
+UPSERT_BATCH_SIZE = 500
+
+logger = logging.getLogger(__name__)
+
+def upsert_likes(db: Session, rows: list):
+    table = models.PostLike.__table__
+    dialect = db.get_bind().dialect.name
+    if dialect == "mysql":
+        stmt = mysql.insert(table)
+        stmt = stmt.on_duplicate_key_update(value=stmt.inserted.value)
+    elif dialect in ("sqlite", "postgresql"):
+        stmt = (sqlite if dialect == "sqlite" else postgresql).insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["user_id", "post_id"],
+            set_={"value": stmt.excluded.value}
+        )
+    else:
+        for row in rows:
+            like = db.query(models.PostLike).filter(
+                models.PostLike.user_id == row["user_id"],
+                models.PostLike.post_id == row["post_id"]
+            ).first()
+            if like:
+                like.value = row["value"]
+            else:
+                db.add(models.PostLike(**row))
+        return
+
+    for i in range(0, len(rows), UPSERT_BATCH_SIZE):
+        db.execute(stmt, rows[i:i + UPSERT_BATCH_SIZE])
+
+class RatingBuffer:
+    def __init__(self, config: dict):
+        self.enabled = config["enabled"]
+        self.max_pending = config["max_pending"]
+        self.pending = {}  # (user_id, post_id) -> value
+        # пачка, которая сейчас записывается: до коммита ее оценок нет ни в pending, ни в БД
+        self.in_flight = {}
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.worker = PeriodicWorker("rating-flush", config["flush_interval"], self.flush)
+
+    def start(self):
+        if self.enabled:
+            self.worker.start()
+
+    def stop(self):
+        self.worker.stop()
+        try:
+            self.flush()
+        except Exception:
+            # остановка приложения должна продолжиться, даже если БД недоступна
+            logger.exception("failed to flush %d pending ratings on shutdown", len(self.pending))
+
+    def add(self, user_id: int, post_id: int, value: int):
+        with self.lock:
+            self.pending[(user_id, post_id)] = value
+            full = len(self.pending) >= self.max_pending
+        if full:
+            self.worker.wake()
+
+    # последняя оценка пользователя, которая еще не попала в БД
+    def get_pending(self, user_id: int, post_id: int) -> Optional[int]:
+        key = (user_id, post_id)
+        with self.lock:
+            value = self.pending.get(key)
+            return value if value is not None else self.in_flight.get(key)
+
+    def flush(self):
+        with self.flush_lock:
+            with self.lock:
+                batch, self.pending = self.pending, {}
+                self.in_flight = batch
+            if not batch:
+                return
+
+            db = SessionLocal()
+            try:
+                # пока оценка ждала в буфере, пост или пользователь могли быть удалены
+                post_ids = {post_id for _, post_id in batch}
+                user_ids = {user_id for user_id, _ in batch}
+                existing_posts = set(db.execute(
+                    select(models.Post.id).where(models.Post.id.in_(post_ids))
+                ).scalars())
+                existing_users = set(db.execute(
+                    select(models.User.id).where(models.User.id.in_(user_ids))
+                ).scalars())
+                rows = [
+                    {"user_id": user_id, "post_id": post_id, "value": value}
+                    for (user_id, post_id), value in batch.items()
+                    if post_id in existing_posts and user_id in existing_users
+                ]
+                upsert_likes(db, rows)
+                db.commit()
+            except Exception:
+                db.rollback()
+                # возвращаем пачку в буфер, не затирая более свежие оценки
+                with self.lock:
+                    for key, value in batch.items():
+                        self.pending.setdefault(key, value)
+                    self.in_flight = {}
+                raise
+            else:
+                with self.lock:
+                    self.in_flight = {}
+                self.publish_ratings(db, {row["post_id"] for row in rows})
+            finally:
+                db.close()
+
+    def publish_ratings(self, db: Session, post_ids: set):
+        post_ids = [post_id for post_id in post_ids if hub.has_subscribers(post_id)]
+        if not post_ids:
+            return
+        ratings = db.execute(
+            select(models.Post.id, models.Post.rating).where(models.Post.id.in_(post_ids))
+        ).all()
+        for post_id, rating in ratings:
+            hub.publish(post_id, "rating", {"post_id": post_id, "rating": rating})
+
+rating_buffer = RatingBuffer(settings["rating_buffer"])
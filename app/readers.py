@@ -0,0 +1,107 @@
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from typing import Optional
+
+from . import models, utils
+
+# чтение для списков без ORM: Core select() только нужных колонок, автор подтягивается join'ом,
+# строки (Row - легкие namedtuple) сразу превращаются в dict'ы под схемы ответов.
+# identity map, ленивые загрузки и создание объектов моделей здесь не нужны
+
+FEED_TEXT_LENGTH = 400
+
+USER_FIELDS = ("id", "username", "email", "name", "surname", "avatar", "is_admin")
+
+def user_columns(prefix: str = "") -> list:
+    return [getattr(models.User, field).label(prefix + field) for field in USER_FIELDS]
+
+def user_dict(row, prefix: str = "") -> dict:
+    return {field: getattr(row, prefix + field) for field in USER_FIELDS}
+
+def get_feed(db: Session, offset: int, limit: int) -> list:
+    # в ленту идет только начало текста, поэтому весь текст (до 8 КБ) из БД не читаем.
+    # один лишний символ нужен, чтобы cut_string понял, что текст длиннее
+    query = select(
+        models.Post.id,
+        models.Post.title,
+        func.substr(models.Post.text, 1, FEED_TEXT_LENGTH + 1).label("text"),
+        models.Post.created_at,
+        models.Post.preview,
+        models.Post.rating.label("rating"),
+        *user_columns("author_"),
+    ).join(models.User, models.User.id == models.Post.user_id) \
+     .order_by(models.Post.created_at.desc()) \
+     .offset(offset).limit(limit)
+
+    return [
+        {
+            "id": row.id,
+            "title": row.title,
+            "text": utils.cut_string(row.text, FEED_TEXT_LENGTH) if row.text else row.text,
+            "created_at": row.created_at,
+            "preview": row.preview,
+            "rating": row.rating,
+            "author": user_dict(row, "author_"),
+        }
+        for row in db.execute(query)
+    ]
+
+def get_user_feed(db: Session, user_id: int, offset: int, limit: int) -> list:
+    query = select(
+        models.Post.id,
+        models.Post.title,
+        models.Post.preview,
+        models.Post.created_at,
+    ).where(models.Post.user_id == user_id) \
+     .order_by(models.Post.created_at.desc()) \
+     .offset(offset).limit(limit)
+    return [row._asdict() for row in db.execute(query)]
+
+def count_comments(db: Session, post_id: int) -> int:
+    return db.execute(
+        select(func.count()).select_from(models.Comment).where(models.Comment.post_id == post_id)
+    ).scalar()
+
+def get_comments(db: Session, post_id: int, offset: int, limit: int) -> list:
+    query = select(
+        models.Comment.id,
+        models.Comment.post_id,
+        models.Comment.text,
+        models.Comment.created_at,
+        *user_columns("user_"),
+    ).join(models.User, models.User.id == models.Comment.user_id) \
+     .where(models.Comment.post_id == post_id) \
+     .order_by(models.Comment.created_at.desc()) \
+     .offset(offset).limit(limit)
+
+    return [
+        {
+            "id": row.id,
+            "user": user_dict(row, "user_"),
+            "post_id": row.post_id,
+            "text": row.text,
+            "created_at": row.created_at,
+        }
+        for row in db.execute(query)
+    ]
+
+def users_query(is_admin: Optional[bool], username_prefix: Optional[str]):
+    query = select(*user_columns())
+    if is_admin is not None:
+        query = query.where(models.User.is_admin == is_admin)
+    if username_prefix:
+        query = query.where(models.User.username.startswith(username_prefix, autoescape=True))
+    return query.order_by(models.User.id)
+
+def get_users(db: Session, cursor: Optional[int], limit: int,
+              is_admin: Optional[bool] = None, username_prefix: Optional[str] = None) -> list:
+    query = users_query(is_admin, username_prefix)
+    if cursor is not None:
+        query = query.where(models.User.id > cursor)
+    return [row._asdict() for row in db.execute(query.limit(limit))]
+
+def iter_users(db: Session, batch_size: int,
+               is_admin: Optional[bool] = None, username_prefix: Optional[str] = None):
+    result = db.execute(users_query(is_admin, username_prefix).execution_options(yield_per=batch_size))
+    for row in result:
+        yield row
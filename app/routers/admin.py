@@ -1,10 +1,13 @@
-import os
-from fastapi import APIRouter, Depends, HTTPException
+import csv
+import io
+import json
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List
+from typing import Literal, Optional
 from ..database import SessionLocal
 from ..dependencies import get_current_user_id
-from .. import models, schemas
+from .. import deletion, models, readers, schemas, storage
 
 router = APIRouter()
 
@@ -20,11 +23,63 @@ def check_if_admin(user_id: int, db: Session):
     if not user or not user.is_admin:
         raise HTTPException(status_code=403, detail="Admin privileges required")
 
-@router.get("/users", response_model=List[schemas.UserOut])
-def list_users(db: Session = Depends(get_db), admin_id: int = Depends(get_current_user_id)):
+EXPORT_CHUNK_SIZE = 1000
+
+# курсор - id последнего пользователя с предыдущей страницы
+@router.get("/users", response_model=schemas.PaginatedUsers)
+def list_users(cursor: Optional[int] = None,
+               limit: int = Query(50, ge=1, le=500),
+               is_admin: Optional[bool] = None,
+               username_prefix: Optional[str] = None,
+               db: Session = Depends(get_db),
+               admin_id: int = Depends(get_current_user_id)):
+    check_if_admin(admin_id, db)
+    # берем на одну запись больше, чтобы понять, есть ли следующая страница
+    users = readers.get_users(db, cursor, limit + 1, is_admin, username_prefix)
+
+    next_cursor = None
+    if len(users) > limit:
+        users = users[:limit]
+        next_cursor = users[-1]["id"]
+    return {"data": users, "next_cursor": next_cursor}
+
+def iter_export(format: str, is_admin: Optional[bool], username_prefix: Optional[str]):
+    # у генератора своя сессия: он работает уже после того, как зависимость закрыла свою
+    db = SessionLocal()
+    try:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if format == "csv":
+            writer.writerow(readers.USER_FIELDS)
+
+        rows = readers.iter_users(db, EXPORT_CHUNK_SIZE, is_admin, username_prefix)
+        for i, row in enumerate(rows, 1):
+            if format == "csv":
+                writer.writerow(row)
+            else:
+                buffer.write(json.dumps(row._asdict(), ensure_ascii=False))
+                buffer.write("\n")
+            if i % EXPORT_CHUNK_SIZE == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+    finally:
+        db.close()
+
+@router.get("/users/export")
+def export_users(format: Literal["ndjson", "csv"] = "ndjson",
+                 is_admin: Optional[bool] = None,
+                 username_prefix: Optional[str] = None,
+                 db: Session = Depends(get_db),
+                 admin_id: int = Depends(get_current_user_id)):
     check_if_admin(admin_id, db)
-    users = db.query(models.User).all()
-    return users
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        iter_export(format, is_admin, username_prefix),
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename=users.{format}"}
+    )
 
 @router.put("/users/{user_id}/toggle_admin", response_model=schemas.UserOut)
 def toggle_admin(user_id: int, db: Session = Depends(get_db), admin_id: int = Depends(get_current_user_id)):
@@ -38,13 +93,14 @@ def toggle_admin(user_id: int, db: Session = Depends(get_db), admin_id: int = De
     return user
 
 @router.delete("/users/{user_id}")
-def delete_user(user_id: int, db: Session = Depends(get_db), admin_id: int = Depends(get_current_user_id)):
+def delete_user(user_id: int, background_tasks: BackgroundTasks,
+                db: Session = Depends(get_db), admin_id: int = Depends(get_current_user_id)):
     check_if_admin(admin_id, db)
     user = db.query(models.User).filter(models.User.id == user_id).first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    db.delete(user)
-    db.commit()
+    if deletion.delete_user(db, user, background_tasks):
+        return {"detail": f"User {user_id} deletion scheduled"}
     return {"detail": f"User {user_id} deleted"}
 
 @router.delete("/users/{user_id}/avatar")
@@ -56,10 +112,8 @@ def delete_user_avatar(user_id: int, db: Session = Depends(get_db), admin_id: in
     if not user.avatar:
         raise HTTPException(status_code=404, detail="User has no avatar")
 
-    avatar_path = os.path.join("uploads", user.avatar)
-    if os.path.exists(avatar_path):
-        os.remove(avatar_path)
-
+    avatar = user.avatar
     user.avatar = None
     db.commit()
+    storage.release_file(db, avatar)
     return {"detail": f"Avatar deleted for user {user_id}"}
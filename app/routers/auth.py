@@ -1,14 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException, Response
+import logging
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from sqlalchemy.orm import Session
 from datetime import datetime
 
 from app.dependencies import get_current_user_id
 
 from ..database import SessionLocal
-from .. import models, schemas, utils
+from .. import limiter, mailer, models, schemas, utils
 
 router = APIRouter()
 
+logger = logging.getLogger(__name__)
+
 def get_db():
     db = SessionLocal()
     try:
@@ -86,21 +89,33 @@ def login(
 
 @router.post("/logout")
 def logout(
+    request: Request,
     db: Session = Depends(get_db),
     user_id: int = Depends(get_current_user_id),
     response: Response = None
 ):
     db.query(models.UserSession).filter(models.UserSession.user_id == user_id).delete()
     db.commit()
+    limiter.forget_session(request.cookies.get("Authorization"))
 
     response.delete_cookie(key="Authorization")
     return {"detail": "Logged out"}
 
-# TODO реализовать проверку почты
 @router.post("/send_code")
-def send_code(data: schemas.SendCodeRequest, db: Session = Depends(get_db), user_id: int = None):
-    if not user_id:
-        raise HTTPException(status_code=401, detail="Auth required")
+def send_code(
+    data: schemas.SendCodeRequest,
+    db: Session = Depends(get_db),
+    user_id: int = Depends(get_current_user_id)
+):
+    user = db.query(models.User).filter(models.User.id == user_id).first()
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    # действует только последний код каждого типа
+    db.query(models.TempCode).filter(
+        models.TempCode.user_id == user_id,
+        models.TempCode.type == data.reason
+    ).delete()
 
     code = utils.generate_code(6)
     expires = utils.get_future_time(10)
@@ -111,17 +126,23 @@ def send_code(data: schemas.SendCodeRequest, db: Session = Depends(get_db), user
         expires=expires
     )
     db.add(temp)
+    mailer.enqueue(db, user, data.reason, "Confirmation code",
+                   f"Your confirmation code: {code}\nIt expires in 10 minutes.")
     db.commit()
-    # TODO разбраться с email.mime и сделать отправку
-    print(f"[DEBUG] Code for user {user_id}: {code}")
+
+    if mailer.outbox_sender.config["enabled"]:
+        mailer.outbox_sender.wake()
+    else:
+        logger.info("email delivery is disabled, code for user %s: %s", user_id, code)
     return {"detail": "Code sent. Check your email (or logs...)"}
 
 
 @router.post("/confirm_email")
-def confirm_email(data: schemas.ConfirmEmailRequest, db: Session = Depends(get_db), user_id: int = None):
-    if not user_id:
-        raise HTTPException(status_code=401, detail="Auth required")
-
+def confirm_email(
+    data: schemas.ConfirmEmailRequest,
+    db: Session = Depends(get_db),
+    user_id: int = Depends(get_current_user_id)
+):
     temp_code = db.query(models.TempCode).filter(
         models.TempCode.user_id == user_id,
         models.TempCode.code == data.code,
@@ -1,10 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session, joinedload
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 from datetime import datetime
 
 from ..database import SessionLocal
 from ..dependencies import get_current_user_id
-from .. import models, schemas
+from ..events import hub
+from ..settings import settings
+from .. import models, readers, schemas
 
 router = APIRouter()
 
@@ -20,21 +25,51 @@ def get_comments(post: int, page: int = 1, db: Session = Depends(get_db)):
     per_page = 10
     skip = (page - 1) * per_page
 
-    comments_query = db.query(models.Comment).options(joinedload(models.Comment.user)) \
-        .filter(models.Comment.post_id == post)
-    total = comments_query.count()
-    comments = comments_query.order_by(models.Comment.created_at.desc()) \
-                             .offset(skip).limit(per_page).all()
+    return {
+        "total": readers.count_comments(db, post),
+        "page": page,
+        "per_page": per_page,
+        "data": readers.get_comments(db, post, skip, per_page)
+    }
 
-    comment_out_list = [schemas.CommentOut.from_orm(c) for c in comments]
+def post_exists(post_id: int) -> bool:
+    db = SessionLocal()
+    try:
+        return db.query(models.Post.id).filter(models.Post.id == post_id).first() is not None
+    finally:
+        db.close()
 
-    paginated = schemas.PaginatedComments(
-        total=total,
-        page=page,
-        per_page=per_page,
-        data=comment_out_list
+# подписка создается в самом генераторе: если ответ так и не начнет отправляться,
+# генератор не запустится, и подписчик не останется висеть в hub
+async def event_stream(request: Request, post: int):
+    keepalive = settings["events"]["keepalive"]
+    subscriber = hub.subscribe(post)
+    try:
+        yield "retry: 3000\n\n"
+        while True:
+            try:
+                payload = await asyncio.wait_for(subscriber.queue.get(), keepalive)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    break
+                yield ": keepalive\n\n"
+                continue
+            if payload is None:  # клиента отключили как медленного
+                break
+            yield payload
+    finally:
+        hub.unsubscribe(subscriber)
+
+# SSE поток новых/удаленных комментариев и изменений рейтинга поста, вместо опроса GET /comment
+@router.get("/stream")
+async def stream_comments(post: int, request: Request):
+    if not await run_in_threadpool(post_exists, post):
+        raise HTTPException(status_code=404, detail="Post not found")
+    return StreamingResponse(
+        event_stream(request, post),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
     )
-    return paginated.model_dump()
 
 @router.post("", response_model=schemas.CommentOut)
 def create_comment(data: schemas.CommentCreate,
@@ -52,7 +87,9 @@ def create_comment(data: schemas.CommentCreate,
     db.add(new_comment)
     db.commit()
     db.refresh(new_comment)
-    return new_comment
+    comment_out = schemas.CommentOut.model_validate(new_comment)
+    hub.publish(data.post_id, "comment_created", comment_out.model_dump(mode="json"))
+    return comment_out
 
 @router.delete("")
 def delete_comment(comment_id: int,
@@ -68,6 +105,8 @@ def delete_comment(comment_id: int,
     if cmt.user_id != user_id and not user.is_admin:
         raise HTTPException(status_code=403, detail="Access denied")
 
+    post_id = cmt.post_id
     db.delete(cmt)
     db.commit()
+    hub.publish(post_id, "comment_deleted", {"id": comment_id, "post_id": post_id})
     return {"detail": "Comment deleted"}
@@ -1,17 +1,29 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request, Response
 from fastapi.responses import FileResponse
 import os
 
-router = APIRouter()
+from .. import storage
 
-BASE_DIR = "uploads"
+router = APIRouter()
 
 # роут получения файла из хранилища
 @router.get("/{filename}")
-def get_file(filename: str):
-    file_path = os.path.join(BASE_DIR, filename)
+def get_file(filename: str, request: Request):
+    if os.path.basename(filename) != filename:
+        raise HTTPException(status_code=404, detail="File not found")
+    file_path = storage.get_file_path(filename)
 
     if not os.path.exists(file_path):
         raise HTTPException(status_code=404, detail="File not found")
 
-    return FileResponse(path=file_path, media_type="application/octet-stream")
+    if not storage.is_content_addressed(filename):
+        return FileResponse(path=file_path, media_type="application/octet-stream")
+
+    # содержимое файла определяется его именем, поэтому хеш годится как ETag и файл можно кешировать навсегда
+    headers = {
+        "ETag": f'"{storage.get_digest(filename)}"',
+        "Cache-Control": "public, max-age=31536000, immutable",
+    }
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=304, headers=headers)
+    return FileResponse(path=file_path, media_type="application/octet-stream", headers=headers)
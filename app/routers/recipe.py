@@ -1,9 +1,11 @@
 from fastapi import APIRouter, Depends, File, Form, HTTPException, Query, UploadFile
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.orm import Session
 
 from ..database import SessionLocal
 from ..dependencies import get_current_user_id
-from .. import models, schemas, utils
+from ..events import hub
+from ..rating_buffer import rating_buffer, upsert_likes
+from .. import deletion, models, readers, schemas, storage
 
 router = APIRouter()
 
@@ -18,16 +20,7 @@ def get_db():
 def get_feed(page: int = 1, db: Session = Depends(get_db)):
     per_page = 10
     skip = (page - 1) * per_page
-    posts_query = db.query(models.Post).options(joinedload(models.Post.author))\
-                    .order_by(models.Post.created_at.desc())
-    total = posts_query.count()
-    posts = posts_query.offset(skip).limit(per_page).all()
-
-    for post in posts:
-        if post.text:
-            post.text = utils.cut_string(post.text, 400)
-
-    return posts
+    return readers.get_feed(db, skip, per_page)
 
 @router.get("", response_model=schemas.PostDetail)
 def get_recipe(id: int, db: Session = Depends(get_db)):
@@ -49,7 +42,7 @@ def create_recipe(
         allowed_types = ["image/jpeg", "image/png", "image/gif"]
         if preview.content_type not in allowed_types:
             raise HTTPException(status_code=400, detail="Only image files (JPEG, PNG, GIF) are allowed")
-        preview_filename = utils.store_file_in_directory(preview, base_dir="uploads")
+        preview_filename = storage.store_file(preview)
 
     new_post = models.Post(
         user_id=user_id,
@@ -75,8 +68,7 @@ def delete_recipe(post_id: int,
         raise HTTPException(status_code=404, detail="User not found")
     if post.user_id != user_id and not user.is_admin:
         raise HTTPException(status_code=403, detail="Access denied")
-    db.delete(post)
-    db.commit()
+    deletion.delete_post(db, post)
     return {"detail": "Post deleted"}
 
 
@@ -88,21 +80,29 @@ def rate_post(data: schemas.RatePostRequest,
     if not post:
         raise HTTPException(status_code=404, detail="Post not found")
 
-    existing_like = db.query(models.PostLike).filter(
-        models.PostLike.user_id == user_id,
-        models.PostLike.post_id == data.post_id
-    ).first()
-
     value = 1 if data.like else -1
 
-    if existing_like:
-        existing_like.value = value
-    else:
-        new_like = models.PostLike(
-            user_id=user_id,
-            post_id=data.post_id,
-            value=value
-        )
-        db.add(new_like)
+    if rating_buffer.enabled:
+        rating_buffer.add(user_id, data.post_id, value)
+        return {"detail": "Post rated"}
+
+    # upsert по уникальному индексу: две одновременные первые оценки не падают на IntegrityError
+    upsert_likes(db, [{"user_id": user_id, "post_id": data.post_id, "value": value}])
     db.commit()
+    if hub.has_subscribers(data.post_id):
+        rating = db.query(models.Post.rating).filter(models.Post.id == data.post_id).scalar()
+        hub.publish(data.post_id, "rating", {"post_id": data.post_id, "rating": rating})
     return {"detail": "Post rated"}
+
+# оценка текущего пользователя, с учетом еще не записанной в БД
+@router.get("/my_rating")
+def get_my_rating(post_id: int,
+                  db: Session = Depends(get_db),
+                  user_id: int = Depends(get_current_user_id)):
+    value = rating_buffer.get_pending(user_id, post_id)
+    if value is None:
+        value = db.query(models.PostLike.value).filter(
+            models.PostLike.user_id == user_id,
+            models.PostLike.post_id == post_id
+        ).scalar()
+    return {"post_id": post_id, "value": value}
@@ -1,14 +1,13 @@
-from fastapi import APIRouter, Depends, Form, HTTPException, File, UploadFile
+from fastapi import APIRouter, BackgroundTasks, Depends, Form, HTTPException, File, UploadFile
 from pydantic import EmailStr
 from sqlalchemy.orm import Session
-import os
 
 from app import schemas
 
 from ..database import SessionLocal
 from ..dependencies import get_current_user_id
-from .. import models
-from ..utils import store_file_in_directory
+from .. import deletion, models, readers, storage
+from ..utils import verify_password
 
 router = APIRouter()
 
@@ -19,8 +18,6 @@ def get_db():
     finally:
         db.close()
 
-UPLOAD_DIR = "uploads/avatars"
-
 @router.get("/me", response_model=schemas.UserOut)
 def get_current_user(db: Session = Depends(get_db), user_id: int = Depends(get_current_user_id)):
     user = db.query(models.User).filter(models.User.id == user_id).first()
@@ -65,16 +62,14 @@ def edit_current_user(
     if surname is not None:
         user.surname = surname
 
+    old_avatar = None
     if avatar is not None:
-        avatar_filename = store_file_in_directory(avatar, base_dir="uploads")
-        if user.avatar:
-            old_path = os.path.join("uploads", user.avatar)
-            if os.path.exists(old_path):
-                os.remove(old_path)
-        user.avatar = avatar_filename
+        old_avatar = user.avatar
+        user.avatar = storage.store_file(avatar)
 
     db.commit()
     db.refresh(user)
+    storage.release_file(db, old_avatar)
     return user
 
 @router.post("/avatar")
@@ -87,16 +82,13 @@ def upload_avatar(
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    filename = store_file_in_directory(file, base_dir="uploads")
-
-    if user.avatar:
-        old_path = os.path.join("uploads", user.avatar)
-        if os.path.exists(old_path):
-            os.remove(old_path)
+    filename = storage.store_file(file)
 
+    old_avatar = user.avatar
     user.avatar = filename
     db.commit()
     db.refresh(user)
+    storage.release_file(db, old_avatar)
 
     return {"detail": "Avatar uploaded", "filename": filename}
 
@@ -107,31 +99,26 @@ def delete_avatar(db: Session = Depends(get_db),
     if not user or not user.avatar:
         raise HTTPException(status_code=404, detail="Avatar not found")
 
-    file_path = os.path.join(UPLOAD_DIR, user.avatar)
-    if os.path.exists(file_path):
-        os.remove(file_path)
+    avatar = user.avatar
     user.avatar = None
     db.commit()
+    storage.release_file(db, avatar)
     return {"detail": "Avatar deleted"}
 
 @router.delete("/")
 def delete_user(email: str, password: str,
+                background_tasks: BackgroundTasks,
                 db: Session = Depends(get_db),
                 user_id: int = Depends(get_current_user_id)):
     user = db.query(models.User).filter(models.User.id == user_id).first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    if user.email != email or not user.password == password:
+    if user.email != email or not verify_password(password, user.password):
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
-    if user.avatar:
-        file_path = os.path.join(UPLOAD_DIR, user.avatar)
-        if os.path.exists(file_path):
-            os.remove(file_path)
-
-    db.delete(user)
-    db.commit()
+    if deletion.delete_user(db, user, background_tasks):
+        return {"detail": f"User {user_id} deletion scheduled"}
     return {"detail": f"User {user_id} deleted"}
 
 @router.get("/{username}")
@@ -155,16 +142,4 @@ def get_user_feed(username: str, page: int = 1, db: Session = Depends(get_db)):
 
     per_page = 10
     skip = (page - 1) * per_page
-    posts = db.query(models.Post).filter(models.Post.user_id == user.id)\
-                .order_by(models.Post.created_at.desc())\
-                .offset(skip).limit(per_page).all()
-
-    result = []
-    for p in posts:
-        result.append({
-            "id": p.id,
-            "title": p.title,
-            "preview": p.preview,
-            "created_at": p.created_at
-        })
-    return result
+    return readers.get_user_feed(db, user.id, skip, per_page)
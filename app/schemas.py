@@ -22,6 +22,11 @@ class UserOut(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
 
+class PaginatedUsers(BaseModel):
+    data: List[UserOut]
+    next_cursor: Optional[int] = None
+
+
 class UserLogin(BaseModel):
     username_or_email: str
     password: str
@@ -0,0 +1,97 @@
+import json
+import os
+
+# значения по умолчанию, переопределяются файлом configs/app.json (если он есть)
+DEFAULTS = {
+    "rate_limit": {
+        "enabled": True,
+        # сколько ключей (клиент + класс роута) держим в памяти
+        "max_clients": 100000,
+        # rate - запросов в секунду, burst - размер корзины
+        # concurrency - одновременных запросов, queue_timeout - сколько секунд ждать слот
+        "classes": {
+            "auth": {"rate": 1.0, "burst": 10, "concurrency": 8, "queue_timeout": 2.0},
+            "write": {"rate": 5.0, "burst": 20, "concurrency": 16, "queue_timeout": 2.0},
+            "upload": {"rate": 0.5, "burst": 5, "concurrency": 4, "queue_timeout": 5.0},
+            "read": {"rate": 50.0, "burst": 100, "concurrency": 64, "queue_timeout": 1.0},
+            # долгие SSE соединения, concurrency здесь - максимум открытых потоков
+            "stream": {"rate": 0.2, "burst": 5, "concurrency": 1000, "queue_timeout": 0.0},
+        },
+    },
+    "deletion": {
+        # пользователи с большим количеством постов удаляются в фоне пачками
+        "background_threshold": 1000,
+        "batch_size": 500,
+    },
+    "storage": {
+        "base_dir": "uploads",
+        # раз в сколько секунд запускать сборщик неиспользуемых файлов
+        "gc_interval": 3600,
+        # файлы моложе этого возраста не трогаем: ссылка на них может быть еще не закоммичена
+        "gc_grace": 3600,
+    },
+    "events": {
+        # сколько событий может ждать один подписчик, прежде чем его отключат
+        "queue_size": 100,
+        # интервал комментариев-keepalive в SSE потоке, в секундах
+        "keepalive": 15,
+    },
+    "compression": {
+        "enabled": True,
+        # ответы меньше этого размера (в байтах) не сжимаем
+        "min_size": 500,
+        "gzip_level": 6,
+        "brotli_quality": 5,
+        # кеш уже сжатых ответов
+        "cache_entries": 1024,
+        "cache_bytes": 32 * 1024 * 1024,
+        # картинки и файлы из /file уже сжаты, SSE идет потоком
+        "excluded_types": ["image/", "application/octet-stream", "text/event-stream", "application/zip"],
+    },
+    "rating_buffer": {
+        # отложенная запись оценок постов (write-behind), выключена по умолчанию
+        "enabled": False,
+        # как часто сбрасывать накопленные оценки в БД, в секундах
+        "flush_interval": 0.5,
+        # при таком количестве ожидающих оценок сброс запускается сразу
+        "max_pending": 5000,
+    },
+    "email": {
+        # если выключено, письма копятся в email_outbox, а коды пишутся в лог
+        "enabled": False,
+        "host": "localhost",
+        "port": 25,
+        "username": "",
+        "password": "",
+        "starttls": False,
+        "sender": "noreply@localhost",
+        # как часто проверять очередь и сколько писем брать за раз
+        "poll_interval": 5,
+        "batch_size": 50,
+        # взятое в отправку письмо закреплено за процессом столько секунд, потом его может забрать другой
+        "lease": 300,
+        # повторы с экспоненциальной задержкой: backoff * 2^(попытка - 1), но не больше backoff_max
+        "max_attempts": 5,
+        "backoff": 30,
+        "backoff_max": 3600,
+        # неиспользуемое соединение с SMTP закрывается через столько секунд
+        "idle_timeout": 60,
+    },
+}
+
+def _merge(base: dict, override: dict) -> dict:
+    result = dict(base)
+    for key, value in override.items():
+        if isinstance(value, dict) and isinstance(result.get(key), dict):
+            result[key] = _merge(result[key], value)
+        else:
+            result[key] = value
+    return result
+
+def load_settings(path: str = "./configs/app.json") -> dict:
+    if not os.path.exists(path):
+        return DEFAULTS
+    with open(path, encoding="utf-8") as file:
+        return _merge(DEFAULTS, json.load(file))
+
+settings = load_settings()
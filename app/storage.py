@@ -0,0 +1,153 @@
+import hashlib
+import os
+import string
+import time
+from fastapi import UploadFile
+from sqlalchemy import func, select, union
+from sqlalchemy.orm import Session
+from typing import Optional
+
+from .background import PeriodicWorker
+from .database import SessionLocal
+from .settings import settings
+from . import models, utils
+
+# файлы хранятся под своим хешем: uploads/ab/cd/abcd....jpg
+# одинаковые загрузки занимают место один раз, а хеш используется как ETag
+
+BASE_DIR = settings["storage"]["base_dir"]
+CHUNK_SIZE = 64 * 1024
+DIGEST_SIZE = 12  # 24 hex-символа, имя с расширением влезает в String(32)
+MAX_EXT_LENGTH = 8
+HEX_DIGITS = set(string.hexdigits.lower())
+
+def get_extension(file: UploadFile) -> str:
+    if file.content_type == "image/jpeg":
+        return ".jpg"
+    if file.content_type == "image/png":
+        return ".png"
+    # другие типы (в этом приложении тут может быть только гиф). так же успешно может отсутствовать
+    ext = os.path.splitext(file.filename or "")[1].lower()
+    return ext if len(ext) <= MAX_EXT_LENGTH else ""
+
+def get_digest(filename: str) -> str:
+    return os.path.splitext(filename)[0]
+
+def is_content_addressed(filename: str) -> bool:
+    digest = get_digest(filename)
+    return len(digest) == DIGEST_SIZE * 2 and set(digest) <= HEX_DIGITS
+
+def get_file_path(filename: str, base_dir: str = BASE_DIR) -> str:
+    if is_content_addressed(filename):
+        path = os.path.join(base_dir, filename[:2], filename[2:4], filename)
+        if os.path.exists(path):
+            return path
+    # файлы, загруженные до перехода на хеши, лежат плоско
+    return os.path.join(base_dir, filename)
+
+def store_file(file: UploadFile, base_dir: str = BASE_DIR) -> str:
+    tmp_dir = os.path.join(base_dir, "tmp")
+    os.makedirs(tmp_dir, exist_ok=True)
+    tmp_path = os.path.join(tmp_dir, utils.generate_token_hex(24))
+
+    # хешируем прямо во время записи, чтобы не читать файл второй раз
+    hasher = hashlib.blake2b(digest_size=DIGEST_SIZE)
+    with open(tmp_path, "wb") as f:
+        while chunk := file.file.read(CHUNK_SIZE):
+            hasher.update(chunk)
+            f.write(chunk)
+
+    digest = hasher.hexdigest()
+    filename = digest + get_extension(file)
+    shard_dir = os.path.join(base_dir, digest[:2], digest[2:4])
+    path = os.path.join(shard_dir, filename)
+    os.makedirs(shard_dir, exist_ok=True)
+    if os.path.exists(path):
+        os.remove(tmp_path)
+        # освежаем mtime, чтобы сборщик не удалил файл до того, как на него сошлются
+        os.utime(path)
+    else:
+        os.replace(tmp_path, path)
+    return filename
+
+def count_references(db: Session, filename: str) -> int:
+    posts = db.query(func.count(models.Post.id)).filter(models.Post.preview == filename).scalar()
+    users = db.query(func.count(models.User.id)).filter(models.User.avatar == filename).scalar()
+    return posts + users
+
+# вызывать после commit, когда ссылка на файл уже убрана из БД
+def release_file(db: Session, filename: Optional[str], base_dir: str = BASE_DIR):
+    if not filename or count_references(db, filename) > 0:
+        return
+    path = get_file_path(filename, base_dir)
+    try:
+        # тот же файл мог только что вернуть store_file другому запросу, который еще не закоммитил
+        # ссылку (store_file обновляет mtime). такие файлы оставляем сборщику
+        if os.path.getmtime(path) > time.time() - settings["storage"]["gc_grace"]:
+            return
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+def get_referenced(db: Session, filenames: list) -> set:
+    query = union(
+        select(models.Post.preview).where(models.Post.preview.in_(filenames)),
+        select(models.User.avatar).where(models.User.avatar.in_(filenames)),
+    )
+    return set(db.execute(query).scalars().all())
+
+def iter_stored_files(base_dir: str):
+    for root, dirs, files in os.walk(base_dir):
+        for filename in files:
+            yield os.path.join(root, filename)
+
+# удаляет файлы, на которые никто не ссылается и которые старше grace секунд
+def collect_garbage(base_dir: str = BASE_DIR, grace: float = None, batch_size: int = 500) -> int:
+    if not os.path.isdir(base_dir):
+        return 0
+    grace = settings["storage"]["gc_grace"] if grace is None else grace
+    deadline = time.time() - grace
+    tmp_dir = os.path.join(base_dir, "tmp")
+    removed = 0
+
+    db = SessionLocal()
+    try:
+        batch = {}
+        for path in iter_stored_files(base_dir):
+            try:
+                if os.path.getmtime(path) > deadline:
+                    continue
+            except FileNotFoundError:
+                continue
+            # недописанные загрузки
+            if os.path.dirname(path) == tmp_dir:
+                os.remove(path)
+                removed += 1
+                continue
+            batch[os.path.basename(path)] = path
+            if len(batch) >= batch_size:
+                removed += remove_unreferenced(db, batch, deadline)
+                batch = {}
+        if batch:
+            removed += remove_unreferenced(db, batch, deadline)
+    finally:
+        db.close()
+    return removed
+
+def remove_unreferenced(db: Session, batch: dict, deadline: float) -> int:
+    referenced = get_referenced(db, list(batch))
+    removed = 0
+    for filename, path in batch.items():
+        if filename in referenced:
+            continue
+        try:
+            # пока пачка набиралась, store_file мог отдать этот файл новому посту и освежить mtime
+            if os.path.getmtime(path) > deadline:
+                continue
+            os.remove(path)
+        except FileNotFoundError:
+            continue
+        removed += 1
+    return removed
+
+gc_worker = PeriodicWorker("storage-gc", settings["storage"]["gc_interval"], collect_garbage)
@@ -0,0 +1,115 @@
+"""Сравнение ORM и Core (app.readers) путей чтения для списочных роутов.
+
+    python -m app.tools.bench_read --iterations 200
+
+Замеряется отдельно получение данных и получение + валидация через схему ответа
+(как это делает FastAPI), то есть полная стоимость ответа без HTTP.
+"""
+import argparse
+import time
+from argparse import Namespace
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import joinedload, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from ..base import Base
+from .. import models, readers, schemas, utils
+from . import seed
+
+PER_PAGE = 10
+
+def orm_feed(db):
+    posts = db.query(models.Post).options(joinedload(models.Post.author)) \
+              .order_by(models.Post.created_at.desc()).offset(PER_PAGE).limit(PER_PAGE).all()
+    for post in posts:
+        if post.text:
+            post.text = utils.cut_string(post.text, readers.FEED_TEXT_LENGTH)
+    return posts
+
+def orm_comments(db, post_id):
+    query = db.query(models.Comment).options(joinedload(models.Comment.user)) \
+              .filter(models.Comment.post_id == post_id)
+    total = query.count()
+    comments = query.order_by(models.Comment.created_at.desc()).offset(PER_PAGE).limit(PER_PAGE).all()
+    return {"total": total, "page": 2, "per_page": PER_PAGE, "data": comments}
+
+def orm_user_feed(db, user_id):
+    posts = db.query(models.Post).filter(models.Post.user_id == user_id) \
+              .order_by(models.Post.created_at.desc()).offset(0).limit(PER_PAGE).all()
+    return [{"id": p.id, "title": p.title, "preview": p.preview, "created_at": p.created_at} for p in posts]
+
+def orm_users(db, limit):
+    return db.query(models.User).filter(models.User.id > 100).order_by(models.User.id).limit(limit).all()
+
+def core_comments(db, post_id):
+    return {
+        "total": readers.count_comments(db, post_id),
+        "page": 2,
+        "per_page": PER_PAGE,
+        "data": readers.get_comments(db, post_id, PER_PAGE, PER_PAGE),
+    }
+
+def make_cases(post_id: int, user_id: int, users_limit: int) -> list:
+    return [
+        ("recipe.get_feed", list[schemas.PostOut],
+         orm_feed, lambda db: readers.get_feed(db, PER_PAGE, PER_PAGE)),
+        ("comment.get_comments", schemas.PaginatedComments,
+         lambda db: orm_comments(db, post_id), lambda db: core_comments(db, post_id)),
+        ("user.get_user_feed", list[dict],
+         lambda db: orm_user_feed(db, user_id), lambda db: readers.get_user_feed(db, user_id, 0, PER_PAGE)),
+        ("admin.list_users", list[schemas.UserOut],
+         lambda db: orm_users(db, users_limit), lambda db: readers.get_users(db, 100, users_limit)),
+    ]
+
+def measure(Session, adapter, call, iterations: int) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        db = Session()
+        try:
+            result = call(db)
+            if adapter is not None:
+                adapter.validate_python(result, from_attributes=True)
+        finally:
+            db.close()
+    return (time.perf_counter() - started) / iterations * 1000
+
+def busiest(engine, column):
+    with engine.connect() as conn:
+        return conn.execute(
+            select(column).group_by(column).order_by(func.count().desc()).limit(1)
+        ).scalar()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m app.tools.bench_read",
+        description="Benchmark ORM vs Core projection read paths of list endpoints"
+    )
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--users-limit", type=int, default=500, help="page size for admin.list_users")
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--posts", type=int, default=20000)
+    parser.add_argument("--likes", type=int, default=200000)
+    parser.add_argument("--comments", type=int, default=50000)
+    args = parser.parse_args(argv)
+
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    seed.generate(engine, Namespace(users=args.users, posts=args.posts, likes=args.likes,
+                                    comments=args.comments, zipf=1.1, seed=1, batch_size=5000,
+                                    keep_indexes=False))
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    # самый комментируемый пост и самый активный автор
+    post_id = busiest(engine, models.Comment.post_id)
+    user_id = busiest(engine, models.Post.user_id)
+
+    print(f"{'route':<24}{'mode':<10}{'orm, ms':>10}{'core, ms':>10}{'speedup':>10}")
+    for name, response_model, orm_call, core_call in make_cases(post_id, user_id, args.users_limit):
+        for mode, adapter in (("fetch", None), ("+schema", TypeAdapter(response_model))):
+            orm_ms = measure(Session, adapter, orm_call, args.iterations)
+            core_ms = measure(Session, adapter, core_call, args.iterations)
+            print(f"{name:<24}{mode:<10}{orm_ms:>10.3f}{core_ms:>10.3f}{orm_ms / core_ms:>9.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+"""Генерация и загрузка тестовых данных в больших объемах.
+
+    python -m app.tools.seed generate --users 100000 --posts 500000 --likes 5000000 --comments 2000000
+    python -m app.tools.seed export data.ndjson
+    python -m app.tools.seed import data.ndjson
+
+Строки пишутся через Core insert() пачками (executemany) внутри больших транзакций,
+ORM-объекты не создаются. Индексы на время загрузки удаляются и строятся заново.
+"""
+import argparse
+import bisect
+import itertools
+import json
+import random
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from sqlalchemy import DateTime, create_engine, func, insert, select
+from sqlalchemy.engine import Connection, Engine
+
+from ..base import Base
+from .. import models  # noqa: F401 - импорт моделей регистрирует таблицы в Base.metadata
+from .. import utils
+
+TABLES = ["users", "posts", "comments", "post_likes"]  # в порядке внешних ключей
+
+WORDS = (
+    "соль сахар мука яйцо молоко масло лук чеснок перец томат сыр курица рис "
+    "картофель морковь тесто сливки зелень лимон мед корица ваниль грибы"
+).split()
+NAMES = ["Анна", "Иван", "Мария", "Петр", "Олег", "Ольга", "Никита", "Елена", "Denis", "Kate"]
+SURNAMES = ["Иванов", "Петров", "Смирнов", "Кузнецов", "Попов", "Соколов", "Lee", "Smith"]
+
+def zipf_weights(n: int, s: float) -> list:
+    weights = [1 / (rank ** s) for rank in range(1, n + 1)]
+    total = sum(weights)
+    return [w / total for w in weights]
+
+class ZipfChooser:
+    # выбор элемента по ранку с вероятностью ~ 1/rank^s, ранки перемешаны
+    def __init__(self, items: list, s: float):
+        self.items = items[:]
+        random.shuffle(self.items)
+        self.cum_weights = list(itertools.accumulate(zipf_weights(len(items), s)))
+
+    def choose(self):
+        index = bisect.bisect_left(self.cum_weights, random.random() * self.cum_weights[-1])
+        return self.items[min(index, len(self.items) - 1)]
+
+def zipf_counts(total: int, n: int, s: float, cap: int = None) -> list:
+    # раскладываем total событий по n объектам так, чтобы немногие получили большую часть
+    cap = total if cap is None else cap
+    counts = [min(cap, round(total * w)) for w in zipf_weights(n, s)]
+    random.shuffle(counts)
+    return counts
+
+def batched(rows, size: int):
+    iterator = iter(rows)
+    while batch := list(itertools.islice(iterator, size)):
+        yield batch
+
+def random_text(words: int) -> str:
+    return " ".join(random.choices(WORDS, k=words))
+
+def next_id(conn: Connection, table) -> int:
+    return (conn.execute(select(func.max(table.c.id))).scalar() or 0) + 1
+
+@contextmanager
+def bulk_load(engine: Engine, tables: list, drop_indexes: bool = True):
+    with engine.connect() as conn:
+        # проверки внешних ключей и индексы на время загрузки отключаем
+        if engine.dialect.name == "sqlite":
+            conn.exec_driver_sql("PRAGMA foreign_keys=OFF")
+            conn.exec_driver_sql("PRAGMA synchronous=OFF")
+        elif engine.dialect.name == "mysql":
+            conn.exec_driver_sql("SET FOREIGN_KEY_CHECKS=0")
+            conn.exec_driver_sql("SET UNIQUE_CHECKS=0")
+        conn.commit()
+
+        indexes = [index for table in tables for index in table.indexes] if drop_indexes else []
+        for index in indexes:
+            index.drop(conn, checkfirst=True)
+        conn.commit()
+        try:
+            yield conn
+        finally:
+            started = time.monotonic()
+            for index in indexes:
+                index.create(conn, checkfirst=True)
+            conn.commit()
+            if indexes:
+                log(f"rebuilt {len(indexes)} indexes in {time.monotonic() - started:.1f}s")
+            if engine.dialect.name == "sqlite":
+                conn.exec_driver_sql("PRAGMA foreign_keys=ON")
+            elif engine.dialect.name == "mysql":
+                conn.exec_driver_sql("SET FOREIGN_KEY_CHECKS=1")
+                conn.exec_driver_sql("SET UNIQUE_CHECKS=1")
+
+def load_rows(conn: Connection, table, rows, batch_size: int) -> int:
+    started = time.monotonic()
+    count = 0
+    # одна транзакция на таблицу, внутри - executemany пачками по batch_size
+    for batch in batched(rows, batch_size):
+        conn.execute(insert(table), batch)
+        count += len(batch)
+    conn.commit()
+    log(f"{table.name}: {count} rows in {time.monotonic() - started:.1f}s")
+    return count
+
+def generate_users(first_id: int, count: int):
+    password = utils.hash_password("password")
+    for user_id in range(first_id, first_id + count):
+        yield {
+            "id": user_id,
+            "username": f"user{user_id}",
+            "email": f"user{user_id}@example.com",
+            "password": password,
+            "name": random.choice(NAMES),
+            "surname": random.choice(SURNAMES),
+            "avatar": None,
+            "is_admin": False,
+        }
+
+def generate_posts(first_id: int, count: int, authors: ZipfChooser, now: datetime, created: list):
+    for post_id in range(first_id, first_id + count):
+        created_at = now - timedelta(seconds=random.randint(0, 365 * 24 * 3600))
+        created.append(created_at)
+        yield {
+            "id": post_id,
+            "user_id": authors.choose(),
+            "title": random_text(3)[:64],
+            "text": random_text(random.randint(20, 400))[:8192],
+            "created_at": created_at,
+            "preview": None,
+        }
+
+def generate_likes(first_id: int, post_ids: list, counts: list, user_ids: list):
+    like_id = first_id
+    for post_id, count in zip(post_ids, counts):
+        # один пользователь оценивает пост не больше одного раза
+        for user_id in random.sample(user_ids, count):
+            yield {
+                "id": like_id,
+                "user_id": user_id,
+                "post_id": post_id,
+                "value": 1 if random.random() < 0.8 else -1,
+            }
+            like_id += 1
+
+def generate_comments(first_id: int, post_ids: list, counts: list, post_dates: list,
+                      user_ids: list, now: datetime):
+    comment_id = first_id
+    for post_id, count, post_date in zip(post_ids, counts, post_dates):
+        span = max(1, int((now - post_date).total_seconds()))
+        for _ in range(count):
+            yield {
+                "id": comment_id,
+                "user_id": random.choice(user_ids),
+                "post_id": post_id,
+                "text": random_text(random.randint(3, 60))[:2048],
+                "created_at": post_date + timedelta(seconds=random.randint(0, span)),
+            }
+            comment_id += 1
+
+def generate(engine: Engine, args):
+    random.seed(args.seed)
+    tables = [Base.metadata.tables[name] for name in TABLES]
+    users, posts, comments, likes = tables
+    now = datetime.utcnow()
+
+    with bulk_load(engine, tables, not args.keep_indexes) as conn:
+        first_user = next_id(conn, users)
+        load_rows(conn, users, generate_users(first_user, args.users), args.batch_size)
+        user_ids = list(range(first_user, first_user + args.users))
+
+        # авторы тоже распределены по Ципфу: немногие пишут большую часть постов
+        first_post = next_id(conn, posts)
+        post_dates = []
+        load_rows(conn, posts, generate_posts(first_post, args.posts, ZipfChooser(user_ids, args.zipf),
+                                              now, post_dates), args.batch_size)
+        post_ids = list(range(first_post, first_post + args.posts))
+
+        like_counts = zipf_counts(args.likes, args.posts, args.zipf, cap=len(user_ids))
+        load_rows(conn, likes, generate_likes(next_id(conn, likes), post_ids, like_counts, user_ids),
+                  args.batch_size)
+
+        comment_counts = zipf_counts(args.comments, args.posts, args.zipf)
+        load_rows(conn, comments, generate_comments(next_id(conn, comments), post_ids, comment_counts,
+                                                    post_dates, user_ids, now), args.batch_size)
+
+def export_ndjson(engine: Engine, path: str, batch_size: int):
+    with engine.connect() as conn, open(path, "w", encoding="utf-8") as file:
+        for name in TABLES:
+            table = Base.metadata.tables[name]
+            result = conn.execution_options(stream_results=True, yield_per=batch_size) \
+                .execute(select(table).order_by(table.c.id))
+            count = 0
+            for row in result.mappings():
+                file.write(json.dumps({"table": name, "row": dict(row)}, ensure_ascii=False, default=str))
+                file.write("\n")
+                count += 1
+            log(f"{name}: exported {count} rows")
+
+def read_ndjson(path: str, name: str):
+    table = Base.metadata.tables[name]
+    date_columns = [column.name for column in table.columns if isinstance(column.type, DateTime)]
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            record = json.loads(line)
+            if record["table"] != name:
+                continue
+            row = record["row"]
+            for column in date_columns:
+                if row.get(column):
+                    row[column] = datetime.fromisoformat(row[column])
+            yield row
+
+def import_ndjson(engine: Engine, path: str, args):
+    tables = [Base.metadata.tables[name] for name in TABLES]
+    # файл читается по разу на таблицу, чтобы соблюсти порядок внешних ключей и не держать его в памяти
+    with bulk_load(engine, tables, not args.keep_indexes) as conn:
+        for table in tables:
+            load_rows(conn, table, read_ndjson(path, table.name), args.batch_size)
+
+def log(message: str):
+    print(message, file=sys.stderr)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m app.tools.seed",
+        description="Generate, export and import bulk users/posts/comments/likes data"
+    )
+    parser.add_argument("--url", help="database URL (by default the one from configs/db.json)")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--keep-indexes", action="store_true", help="do not drop indexes during the load")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    generate_parser = commands.add_parser("generate", help="generate synthetic data")
+    generate_parser.add_argument("--users", type=int, default=10000)
+    generate_parser.add_argument("--posts", type=int, default=50000)
+    generate_parser.add_argument("--likes", type=int, default=500000)
+    generate_parser.add_argument("--comments", type=int, default=200000)
+    generate_parser.add_argument("--zipf", type=float, default=1.1, help="skew exponent")
+    generate_parser.add_argument("--seed", type=int, default=None)
+
+    export_parser = commands.add_parser("export", help="dump users, posts, comments and likes to NDJSON")
+    export_parser.add_argument("path")
+
+    import_parser = commands.add_parser("import", help="load NDJSON produced by export")
+    import_parser.add_argument("path")
+
+    args = parser.parse_args(argv)
+
+    if args.url:
+        engine = create_engine(args.url)
+    else:
+        from ..database import engine
+    Base.metadata.create_all(bind=engine)
+
+    if args.command == "generate":
+        generate(engine, args)
+    elif args.command == "export":
+        export_ndjson(engine, args.path, args.batch_size)
+    else:
+        import_ndjson(engine, args.path, args)
+
+if __name__ == "__main__":
+    main()
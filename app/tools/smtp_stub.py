@@ -0,0 +1,114 @@
+"""Минимальный SMTP сервер внутри процесса для локальной разработки и проверки отправки писем.
+
+    python -m app.tools.smtp_stub --port 1025
+
+Письма не пересылаются дальше, а печатаются (и складываются в SmtpStub.messages).
+Можно запустить из кода: stub = SmtpStub(port=0).start(); ...; stub.stop()
+"""
+import argparse
+import socketserver
+import threading
+from email import message_from_bytes, policy
+
+class SmtpHandler(socketserver.StreamRequestHandler):
+    def reply(self, line: str):
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self):
+        with self.server.stub.lock:
+            self.server.stub.connections += 1
+        self.reply("220 smtp-stub ready")
+        sender, recipients = None, []
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode("latin-1").strip()
+            verb = command[:4].upper()
+            if verb == "EHLO":
+                self.reply("250-smtp-stub")
+                self.reply("250 8BITMIME")
+            elif verb == "HELO":
+                self.reply("250 smtp-stub")
+            elif verb == "MAIL":
+                sender, recipients = command.partition(":")[2].strip(), []
+                self.reply("250 OK")
+            elif verb == "RCPT":
+                recipients.append(command.partition(":")[2].strip())
+                self.reply("250 OK")
+            elif verb == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                self.server.stub.store(sender, recipients, self.read_data())
+                self.reply("250 OK")
+            elif verb in ("RSET", "NOOP"):
+                if verb == "RSET":
+                    sender, recipients = None, []
+                self.reply("250 OK")
+            elif verb == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+    def read_data(self) -> bytes:
+        lines = []
+        while True:
+            line = self.rfile.readline()
+            if not line or line in (b".\r\n", b".\n"):
+                break
+            # точка в начале строки экранируется отправителем
+            lines.append(line[1:] if line.startswith(b"..") else line)
+        return b"".join(lines)
+
+class SmtpServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+class SmtpStub:
+    def __init__(self, host: str = "127.0.0.1", port: int = 1025, echo: bool = False):
+        self.server = SmtpServer((host, port), SmtpHandler)
+        self.server.stub = self
+        self.echo = echo
+        self.messages = []
+        self.connections = 0
+        self.lock = threading.Lock()
+        self.thread = None
+
+    @property
+    def port(self) -> int:
+        return self.server.server_address[1]
+
+    def store(self, sender: str, recipients: list, data: bytes):
+        message = message_from_bytes(data, policy=policy.default)
+        with self.lock:
+            self.messages.append((sender, recipients, message))
+        if self.echo:
+            print(f"--- from {sender} to {', '.join(recipients)}\n{message}", flush=True)
+
+    def start(self) -> "SmtpStub":
+        self.thread = threading.Thread(target=self.server.serve_forever, name="smtp-stub", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.tools.smtp_stub",
+                                     description="Local SMTP server that prints received messages")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=1025)
+    args = parser.parse_args(argv)
+
+    stub = SmtpStub(args.host, args.port, echo=True)
+    print(f"SMTP stub listening on {args.host}:{stub.port}", flush=True)
+    try:
+        stub.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stub.server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,8 @@
-import os
 import secrets
 import string
 import random
 import hashlib
 from datetime import datetime, timedelta
-from fastapi import UploadFile
-from typing import Optional
 
 def hash_password(password: str) -> str:
     return hashlib.sha256(password.encode()).hexdigest()
@@ -23,33 +20,6 @@ def generate_code(length=6) -> str:
 def get_future_time(minutes=30) -> datetime:
     return datetime.utcnow() + timedelta(minutes=minutes)
 
-def store_file_in_directory(
-    file: UploadFile,
-    base_dir: str = "uploads"
-) -> str:
-    ext = None
-    if file.content_type == "image/jpeg":
-        ext = ".jpg"
-    elif file.content_type == "image/png":
-        ext = ".png"
-    else:
-        # другие типы (в этом приложении тут может быть только гиф). так же успешно может отсутствовать
-        original_ext = os.path.splitext(file.filename)[1]
-
-    os.makedirs(base_dir, exist_ok=True)
-    while True: # генерация уникального имени файла
-        random_name = generate_token_hex(12)  # 24 hex-символа
-        filename = random_name + ext
-        file_path = os.path.join(base_dir, filename)
-        if not os.path.exists(file_path):
-            break
-
-    # 3) Сохраняем файл
-    with open(file_path, "wb") as f:
-        f.write(file.file.read())
-
-    return filename
-
 #эта функция обрезает строки, которые длиннее указанной длины
 # TODO сделать более читаемой
 def cut_string(string, mx, points=True, points_text=" ...", sep=" "):